@@ -26,10 +26,44 @@ Features:
 import os
 import json
 import logging
-from pathlib import Path
+import logging.handlers
+import bisect
+import multiprocessing
 import pandas as pd
 import re
-import glob
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+
+try:
+    import orjson
+except ImportError:  # Optional dependency; fall back to the standard library parser
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # Optional dependency; large files are then loaded whole
+    ijson = None
+
+# Read size used when assignment and FASTA files are read in pieces
+READ_BUFFER_SIZE = 1 << 20
+
+# Threads reading assignment files ahead of the parsing workers
+PREFETCH_WORKERS = 4
+
+# Files the readers may get ahead of the chunks the parsing workers are busy with
+PREFETCH_AHEAD = 32
+
+# Threads writing per-sample FASTA files
+FASTA_WRITER_WORKERS = 4
+
+# Assignment files at least this large are streamed strain by strain when ijson has a C backend
+STREAMING_THRESHOLD = 1 << 20
+
+# ijson backends fast enough to stream with; the pure-Python one is many times slower
+# than loading the whole file
+IJSON_C_BACKENDS = ('yajl2_c', 'yajl2_cffi')
 
 # Virus configuration - makes it easy to add new viruses
 VIRUS_CONFIG = {
@@ -76,6 +110,101 @@ VIRUS_CONFIG = {
     }
 }
 
+def build_taxonomy_matcher(virus_config):
+    """--,
+    Compile every taxonomy keyword in the virus configuration into a single regex,
+    so one scan of a taxonomy name finds the configured keywords it contains.
+    Matches are leftmost and non-overlapping: a keyword lying inside another
+    keyword's match is not reported separately.
+
+    Parameters:
+        virus_config (dict): Configuration in the VIRUS_CONFIG layout.
+
+    Returns:
+        tuple: (compiled pattern, list of (virus_key, influenza type or None) per group)
+    """
+    groups = []
+    payloads = []
+    for virus_key, config in virus_config.items():
+        if config.get('segmented'):
+            entries = [(vtype, tconfig['taxonomy_keywords']) for vtype, tconfig in config['types'].items()]
+        else:
+            entries = [(None, config['taxonomy_keywords'])]
+
+        for vtype, keywords in entries:
+            alternation = '|'.join(re.escape(kw.lower()) for kw in keywords)
+            groups.append(f"(?P<g{len(payloads)}>{alternation})")
+            payloads.append((virus_key, vtype))
+
+    return re.compile('|'.join(groups)), payloads
+
+_TAXONOMY_RE, _TAXONOMY_PAYLOADS = build_taxonomy_matcher(VIRUS_CONFIG)
+
+def match_taxonomy(taxonomy):
+    """...
+    Find the configured viruses whose keywords occur in a lowercased taxonomy name.
+    The name is scanned once from left to right and each match consumes its text,
+    so a keyword overlapping an earlier match is not reported. None of the
+    configured keywords contains another, which this relies on.
+
+    Returns:
+        set: (virus_key, influenza type or None) tuples, e.g. {('influenza', 'A')}
+    """
+    return {_TAXONOMY_PAYLOADS[int(m.lastgroup[1:])] for m in _TAXONOMY_RE.finditer(taxonomy)}
+
+def match_virus(taxonomy, virus_type, virus_key):
+    """--,
+    Decide whether a strain belongs to the virus selected by the user.
+    All taxonomy keyword checks go through here, on a taxonomy name that
+    the caller has lowercased once.
+
+    Parameters:
+        taxonomy (str): Lowercased taxonomy name of the strain.
+        virus_type (str): Influenza type selected ('A', 'B' or 'C' for both); unused otherwise.
+        virus_key (str): Key of the selected virus in VIRUS_CONFIG.
+
+    Returns:
+        str or None: The strain's virus type ('A'/'B' for influenza, otherwise the
+        upper-cased virus key), or None if the strain does not match.
+    """
+    hits = match_taxonomy(taxonomy)
+
+    if virus_key == 'influenza':
+        # Influenza-specific matching based on subtype
+        is_a = ('influenza', 'A') in hits
+        is_b = ('influenza', 'B') in hits
+
+        if (virus_type == 'A' and is_a) or \
+           (virus_type == 'B' and is_b) or \
+           (virus_type == 'C' and (is_a or is_b)):
+            return 'A' if is_a else 'B'
+        return None
+
+    # Match for non-influenza viruses using taxonomy keywords
+    return virus_key.upper() if (virus_key, None) in hits else None
+
+# Markers identifying positive/negative/spike-in control samples
+CONTROL_PATTERN = re.compile(r'PC|NC|Neg|Pos|ERCC')
+
+# Unique sample ID: C0XXXX or K0XXXX (C or K followed by numbers)
+UNIQUE_ID_PATTERN = re.compile(r'([CK]0\d+)')
+
+# Column types of the influenza segment table; measurements keep the types read from the JSON
+SEGMENT_TABLE_DTYPES = {'LimsID': 'category', 'VirusType': 'category', 'Segment': 'category'}
+
+# Column types of the GISAID submission tables; the Yes/No eligibility flag is filtered on repeatedly
+GISAID_TABLE_DTYPES = {'Submit to GISAID': 'category'}
+
+# Segment labels: old format "segment 4-HA", new format "4-HA"
+SEGMENT_PREFIX_PATTERN = re.compile(r'^segment\s+', re.IGNORECASE)
+SEGMENT_LABEL_PATTERN = re.compile(r'^(\d+)(?:-([a-z0-9]+))?$')
+
+# FASTA header line, without surrounding whitespace
+FASTA_HEADER_PATTERN = re.compile(rb'^[^\S\n]*(>[^\n]*?)[^\S\n]*$', re.MULTILINE)
+
+# Segment number in a segment label or FASTA header, e.g. "Segment 4" or "segment4"
+SEGMENT_NUMBER_PATTERN = re.compile(r'[Ss]egment\s*(\d+)')
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -86,6 +215,20 @@ logging.basicConfig(
     ]
 )
 
+def attach_worker_logging(log_queue):
+    """--,
+    Send a worker process's log records to the main process's logging queue.
+    Used as the initializer of the parsing process pool.
+    """
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+    handler = logging.handlers.QueueHandler(log_queue)
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
 def extract_unique_id(sample_id):
     """...
     Extract the true unique ID from a sample identifier.
@@ -100,10 +243,8 @@ def extract_unique_id(sample_id):
     if not sample_id:
         return sample_id
         
-    # Pattern for C0XXXX or K0XXXX (C or K followed by numbers)
-    # This matches patterns like C01234, K01234, C001234, etc.
-    pattern = r'([CK]0\d+)'
-    match = re.search(pattern, sample_id)
+    # Matches patterns like C01234, K01234, C001234, etc.
+    match = UNIQUE_ID_PATTERN.search(sample_id)
     
     if match:
         return match.group(1)
@@ -111,9 +252,23 @@ def extract_unique_id(sample_id):
     # If no pattern found, return original
     return sample_id
 
+def is_control_sample(sample_id):
+    """...
+    Check whether a sample ID or folder name belongs to a control sample.
+
+    Parameters:
+        sample_id (str): Sample ID or folder name.
+
+    Returns:
+        bool: True if the ID contains a control marker (PC, NC, Neg, Pos, ERCC).
+    """
+    return CONTROL_PATTERN.search(sample_id) is not None
+
+@lru_cache(maxsize=None)
 def normalize_limsid(raw_id):
     """--,
     Normalize a raw LIMS ID by removing suffixes for non-control samples.
+    Results are cached, as the same IDs are normalized by several pipeline stages.
     
     Parameters:
         raw_id (str): The raw sample ID from the filename.
@@ -122,7 +277,7 @@ def normalize_limsid(raw_id):
         str: Normalized LIMS ID.
     """
     # First, check if it's a control
-    if "PC" in raw_id or "NC" in raw_id or "Neg" in raw_id or "Pos" in raw_id or "ERCC" in raw_id:
+    if is_control_sample(raw_id):
         return raw_id  # Keep controls as-is
     
     # Check for duplicates with -D suffix
@@ -134,42 +289,118 @@ def normalize_limsid(raw_id):
     
     return unique_id
 
-def create_temp_folder(input_folder):
+def classify_sample_id(json_file):
+    """--,
+    Derive the normalized LIMS ID of an assignments file from its name,
+    and whether it belongs to a control sample.
+
+    Returns:
+        tuple: (lims_id (str), is_control (bool))
+    """
+    base_name = os.path.basename(json_file).replace('.assignments.json', '')
+    lims_id = normalize_limsid(base_name)
+    return lims_id, is_control_sample(lims_id)
+
+def load_json(json_file):
     """...
-    Create temporary folder and copy assignment files.
+    Load a JSON file, using orjson when it is installed and the standard
+    library parser otherwise. The file is read unbuffered, so the whole
+    payload comes back from a single sized read.
+
+    Parameters:
+        json_file (str): Path to the JSON file.
+
+    Returns:
+        dict: The decoded JSON document.
     """
-    temp_folder = os.path.join(os.getcwd(), 'GD_Assignments')
-    os.makedirs(temp_folder, exist_ok=True)
-    logging.info(f"Created temp folder: {temp_folder}")
-    
-    # Track unique files to avoid duplicates
-    copied_files = set()
-    
-    for root, _, files in os.walk(input_folder):
-        for file in files:
-            if file.endswith('.assignments.json'):
-                src_path = os.path.join(root, file)
-                dest_path = os.path.join(temp_folder, file)
-                
-                # Skip if we've already copied this file
-                if file in copied_files:
-                    logging.debug(f"Skipping duplicate file: {file}")
-                    continue
-                    
-                if os.path.abspath(src_path) != os.path.abspath(dest_path):
-                    try:
-                        with open(src_path, 'rb') as src_file:
-                            data = src_file.read()
-                            if not data:
-                                continue
-                            else:
-                                with open(dest_path, 'wb') as dest_file:
-                                    dest_file.write(data)
-                                copied_files.add(file)
-                                #logging.info(f"Copied {file} to temp folder")
-                    except Exception as e:
-                        logging.error(f"Failed to copy {src_path}: {e}")
-    return temp_folder
+    with open(json_file, 'rb', buffering=0) as f:
+        raw = f.read()
+
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def stream_strains(json_file):
+    """--,
+    Yield the strain records of an assignments file one at a time with ijson,
+    so the rest of the document is never held in memory.
+    """
+    with open(json_file, 'rb') as f:
+        yield from ijson.items(f, 'data.attributes.strains.item', use_float=True, buf_size=READ_BUFFER_SIZE)
+
+def load_strains(json_file):
+    """...
+    Return the strain records of a Genome Detective `.assignments.json` file.
+    Files of STREAMING_THRESHOLD bytes or more are streamed when ijson is installed
+    with a C backend, which lowers peak memory at some cost in speed; smaller files,
+    and all files under the pure-Python backend, are decoded in one go.
+
+    Parameters:
+        json_file (str): Path to the assignments file.
+
+    Returns:
+        iterable: Strain dicts from data.attributes.strains.
+    """
+    if (ijson is not None and ijson.backend in IJSON_C_BACKENDS
+            and os.path.getsize(json_file) >= STREAMING_THRESHOLD):
+        return stream_strains(json_file)
+
+    data = load_json(json_file)
+    return data.get('data', {}).get('attributes', {}).get('strains', [])
+
+def iter_assignment_files(root):
+    """--,
+    Recursively yield os.DirEntry objects for the `.assignments.json` files below a folder.
+    Files in a folder are yielded before those in its subfolders, as with os.walk.
+    """
+    subfolders = []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subfolders.append(entry.path)
+                elif entry.name.endswith('.assignments.json'):
+                    yield entry
+    except OSError as e:
+        logging.error("Failed to list %s: %s", root, e)
+        return
+
+    for subfolder in subfolders:
+        yield from iter_assignment_files(subfolder)
+
+def collect_assignment_files(input_folder):
+    """...
+    Collect the Genome Detective `.assignments.json` files in the input folder.
+    Empty files are skipped, and only the first file found with a given name is kept.
+
+    Parameters:
+        input_folder (str): Folder containing the GD-processed sample folders.
+
+    Returns:
+        list: Paths of the assignment files to process.
+    """
+    assignment_files = []
+
+    # Track unique file names to avoid duplicates
+    seen_files = set()
+
+    for entry in iter_assignment_files(input_folder):
+        if entry.name in seen_files:
+            logging.debug("Skipping duplicate file: %s", entry.name)
+            continue
+
+        try:
+            if entry.stat().st_size == 0:
+                continue
+        except OSError as e:
+            logging.error("Failed to read %s: %s", entry.path, e)
+            continue
+
+        seen_files.add(entry.name)
+        assignment_files.append(entry.path)
+
+    logging.info(f"Found {len(assignment_files)} assignment files in {input_folder}")
+    return assignment_files
 
 def get_virus_type():
     """--,
@@ -254,10 +485,10 @@ def extract_segment_number_and_gene(segment_str):
         return None, None
     
     # Remove "segment " prefix if present (for old format)
-    cleaned = re.sub(r'^segment\s+', '', segment_str.lower(), flags=re.IGNORECASE)
+    cleaned = SEGMENT_PREFIX_PATTERN.sub('', segment_str.lower())
     
     # Try to match pattern like "4-ha" or "4" (number followed by optional hyphen and gene)
-    match = re.match(r'^(\d+)(?:-([a-z0-9]+))?$', cleaned)
+    match = SEGMENT_LABEL_PATTERN.match(cleaned)
     if match:
         segment_num = int(match.group(1))
         gene_name = match.group(2).upper() if match.group(2) else None
@@ -269,26 +500,31 @@ def parse_json_file(json_file, virus_type, virus_key, min_depth, min_cov):
     """...
     Parse a Genome Detective JSON `.assignments.json` file and extract viral information.
     Handles both old and new JSON formats.
+
+    The file is read once and yields both the per-strain quality results and
+    the full-genome summary rows consumed by extract_genome_info.
+
+    Returns:
+        tuple: (results (list or None), genome_info (list))
     """
+    genome_info = []
+
     try:
         # First check if file is empty
         if os.path.getsize(json_file) == 0:
-            logging.warning(f"Empty file detected: {json_file}")
-            return None
+            logging.warning("Empty file detected: %s", json_file)
+            return None, genome_info
             
-        with open(json_file, 'r') as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError as e:
-                logging.error(f"Invalid JSON in {json_file}: {e}")
-                return None
-
-        # Extract the unique ID from the filename
-        base_name = os.path.basename(json_file).replace('.assignments.json', '')
-        lims_id = normalize_limsid(base_name)
-
         # Get list of all strains from the file
-        strains = data.get('data', {}).get('attributes', {}).get('strains', [])
+        try:
+            strains = load_strains(json_file)
+        except json.JSONDecodeError as e:
+            logging.error("Invalid JSON in %s: %s", json_file, e)
+            return None, genome_info
+
+        # Extract the unique ID from the filename, and check for controls once per file
+        lims_id, control = classify_sample_id(json_file)
+        is_control = "Yes" if control else "No"
 
         results = []
 
@@ -296,30 +532,30 @@ def parse_json_file(json_file, virus_type, virus_key, min_depth, min_cov):
             taxonomy = strain.get('taxonomyName', '').lower()
 
             # --- Match strain to correct virus type ---
-            if virus_key == 'influenza':
-                # Influenza-specific matching based on subtype
-                is_a = any(kw in taxonomy for kw in VIRUS_CONFIG['influenza']['types']['A']['taxonomy_keywords'])
-                is_b = any(kw in taxonomy for kw in VIRUS_CONFIG['influenza']['types']['B']['taxonomy_keywords'])
-                
-                if (virus_type == 'A' and is_a) or \
-                   (virus_type == 'B' and is_b) or \
-                   (virus_type == 'C' and (is_a or is_b)):
-                    pass  # Keep processing
-                else:
-                    continue  # Skip strain if it doesn't match influenza subtype
-            else:
-                # Match for non-influenza viruses using taxonomy keywords
-                matched = False
-                for kw in VIRUS_CONFIG[virus_key]['taxonomy_keywords']:
-                    if kw.lower() in taxonomy:
-                        matched = True
-                        break
-                
-                if not matched:
-                    continue  # Skip if taxonomy doesn't match
+            # The strain is classified once; current_virus_type is reused below
+            current_virus_type = match_virus(taxonomy, virus_type, virus_key)
+            if current_virus_type is None:
+                continue  # Skip strain if it isn't the selected virus
+
+            # --- Full-genome summary for every matching strain ---
+            genome_info.append({
+                'LimsID': lims_id,
+                'VirusType': current_virus_type,
+                'taxonomyName': strain.get('taxonomyName'),
+                'numberOfReads': strain.get('numberOfReads'),
+                'depthOfCoverage': strain.get('depthOfCoverage'),
+                'coveragePercentage': strain.get('coveragePercentage'),
+                'ntIdentity': strain.get('ntIdentity')
+            })
 
             # --- Handle non-segmented viruses (e.g., HIV, RSV, COVID) ---
             if not VIRUS_CONFIG[virus_key].get('segmented', True):
+                # Only the first result per sample is used downstream, so once it is
+                # found later strains only contribute to the full-genome summary above.
+                # (Influenza keeps every strain: one per type, each with its segments.)
+                if results:
+                    continue
+
                 regions = strain.get('regions', [])
                 if regions:
                     # For non-segmented viruses, take the best region (highest coverage)
@@ -341,281 +577,363 @@ def parse_json_file(json_file, virus_type, virus_key, min_depth, min_cov):
 
                         results.append({
                             'LimsID': lims_id,
-                            'VirusType': virus_key.upper(),
+                            'VirusType': current_virus_type,
                             'coveragePercentage': coverage,
                             'depthOfCoverage': depth,
                             'ntIdentity': strain.get('ntIdentity'),
                             'subTypeConclusion': strain.get('subTypeConclusion'),
                             'Submit to GISAID': "Yes" if passes else "No",
-                            'Is Control': "Yes" if any(ctrl in lims_id for ctrl in ["PC", "NC", "Neg", "Pos", "ERCC"]) else "No",
+                            'Is Control': is_control,
                             'ReferenceSequenceId': best_region.get('referenceSequenceId')
                         })
                 continue  # Move to next strain
 
             # --- Handle segmented viruses (e.g., Influenza A/B) ---
-            # Determine virus type from taxonomy
-            # Determine virus type using config keywords (robust)
-            current_virus_type = None
-
-            for vtype, vconfig in VIRUS_CONFIG['influenza']['types'].items():
-                for kw in vconfig['taxonomy_keywords']:
-                    if kw in taxonomy:
-                        current_virus_type = vtype
-                        break
-                if current_virus_type:
-                    break
-
-            if not current_virus_type:
-                logging.warning(f"Could not determine virus type from taxonomy: {taxonomy}")
-                continue
-            
-            # Process all regions
-            region_data = []
-            
-            for region in strain.get('regions', []):
-                segment_str = region.get('segment', '')
-                segment_num, gene = extract_segment_number_and_gene(segment_str)
-                
-                region_data.append({
-                    'segment': segment_str,
-                    'segment_num': segment_num,
-                    'gene': gene,
-                    'depthOfCoverage': region.get('depthOfCoverage', 0),
-                    'coveragePercentage': region.get('coveragePercentage', 0),
-                    'referenceSequenceId': region.get('referenceSequenceId')
-                })
+            # Process all regions into parallel lists, one entry per region
+            regions = strain.get('regions', [])
+            segment_labels = [region.get('segment', '') for region in regions]
+
+            region_data = {
+                'segments': segment_labels,
+                'segment_nums': [extract_segment_number_and_gene(label)[0] for label in segment_labels],
+                'depths': [region.get('depthOfCoverage', 0) for region in regions],
+                'covs': [region.get('coveragePercentage', 0) for region in regions],
+                'refs': [region.get('referenceSequenceId') for region in regions]
+            }
 
             # Only add if we have regions
-            if region_data:
+            if regions:
                 results.append({
                     'LimsID': lims_id,
                     'coveragePercentage': strain.get('coveragePercentage'),
                     'depthOfCoverage': strain.get('depthOfCoverage'),
                     'subTypeConclusion': strain.get('subTypeConclusion'),
                     'virusType': current_virus_type,
+                    'Is Control': is_control,
                     'regions': region_data
                 })
 
     
 
-        return results if results else None
+        return (results if results else None), genome_info
 
     except Exception as e:
-        logging.error(f"Error parsing {json_file}: {e}")
-        return None
+        logging.error("Error parsing %s: %s", json_file, e)
+        return None, []
+
+# Read buffer of each prefetch thread, reused for every file it reads
+PREFETCH_BUFFERS = threading.local()
+
+def prefetch_file(json_file):
+    """...
+    Get a file into the OS page cache by the time a parsing worker opens it.
+    Where available, the kernel is asked to read it ahead (posix_fadvise);
+    otherwise the file is read and its contents discarded. Errors are left to the parser.
+    """
+    try:
+        with open(json_file, 'rb', buffering=0) as f:
+            if hasattr(os, 'posix_fadvise'):
+                try:
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                    return
+                except OSError:
+                    pass
+
+            buffer = getattr(PREFETCH_BUFFERS, 'buffer', None)
+            if buffer is None:
+                buffer = PREFETCH_BUFFERS.buffer = bytearray(READ_BUFFER_SIZE)
+            while f.readinto(buffer):
+                pass
+    except OSError:
+        pass
+
+def prefetch_order(chunks, workers):
+    """--,
+    Yield the files of the parsing chunks in the order the workers reach them.
+    The workers take chunks in submission order, so each group of `workers` chunks
+    is parsed side by side: the first file of every chunk in the group, then the
+    second, and so on, before the next group starts.
+    """
+    for start in range(0, len(chunks), workers):
+        group = chunks[start:start + workers]
+        for offset in range(len(group[0])):
+            for chunk in group:
+                if offset < len(chunk):
+                    yield chunk[offset]
+
+def parse_json_chunk(parse, json_files):
+    """...
+    Parse a batch of files in one worker task, returning the results in order.
+    """
+    return [parse(json_file) for json_file in json_files]
+
+def parse_json_files(json_files, virus_type, virus_key, min_depth, min_cov):
+    """--,
+    Parse several assignment files in parallel with a process pool.
+    Yields the parse_json_file result for each file, in input order.
+
+    While the workers parse, a small thread pool reads the upcoming files so
+    that slow (e.g. network mounted) storage does not leave the workers idle.
+    """
+    json_files = list(json_files)
+    parse = partial(parse_json_file, virus_type=virus_type, virus_key=virus_key,
+                    min_depth=min_depth, min_cov=min_cov)
+
+    # Not worth starting worker processes for a single file
+    if len(json_files) < 2:
+        yield from map(parse, json_files)
+        return
+
+    # One worker per usable CPU (respecting affinity/cgroup limits where the OS
+    # reports them), but never more workers than files
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    workers = min(len(json_files), cpus)
+
+    # Batch files per task to amortize the pickling overhead, while still
+    # spreading small runs across all workers
+    chunksize = max(1, min(16, len(json_files) // workers))
+    chunks = [json_files[i:i + chunksize] for i in range(0, len(json_files), chunksize)]
+
+    # The readers may hold the files of the chunks being parsed plus PREFETCH_AHEAD
+    # more; each parsed chunk gives its files' places back
+    window = threading.Semaphore(workers * chunksize + PREFETCH_AHEAD)
+    stop_reading = threading.Event()
+
+    def read_ahead(reader):
+        for json_file in prefetch_order(chunks, workers):
+            window.acquire()
+            if stop_reading.is_set():
+                return
+            reader.submit(prefetch_file, json_file)
+
+    # Workers log to a queue that exists only for this pool; a listener thread
+    # passes their records on to this process's handlers
+    log_queue = multiprocessing.Queue(-1)
+    log_listener = logging.handlers.QueueListener(
+        log_queue, *logging.getLogger().handlers, respect_handler_level=True
+    )
+    listening = False
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_worker_logging,
+                                 initargs=(log_queue,)) as executor, \
+                ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as reader:
+            # Submitting the parsing work starts the workers; the listener and reader
+            # threads are only started afterwards, so no worker is forked while they run
+            futures = []
+            for chunk in chunks:
+                future = executor.submit(parse_json_chunk, parse, chunk)
+                future.add_done_callback(lambda _, n=len(chunk): window.release(n))
+                futures.append(future)
+
+            log_listener.start()
+            listening = True
+
+            read_thread = threading.Thread(target=read_ahead, args=(reader,), daemon=True)
+            read_thread.start()
+
+            try:
+                for future in futures:
+                    yield from future.result()
+            finally:
+                stop_reading.set()
+                window.release()
+                read_thread.join()
+                reader.shutdown(cancel_futures=True)
+    finally:
+        # The pool has shut down, so every worker record is already on the queue
+        if listening:
+            log_listener.stop()
+        log_queue.close()
+        log_queue.join_thread()
 
 def evaluate_segment(regions, segment_num, virus_type, min_depth, min_cov):
     """--,
     Evaluate whether a specific viral genome segment passes defined quality thresholds.
-    Handles both old and new segment naming formats.
+    Regions are the parallel lists built by parse_json_file; the first region
+    with the requested segment number is evaluated.
     """
-    for region in regions:
-        segment_str = region.get('segment', '')
-        segment_num_from_str, _ = extract_segment_number_and_gene(segment_str)
-        
-        if segment_num_from_str == segment_num:
-            depth = region.get('depthOfCoverage', 0)
-            coverage = region.get('coveragePercentage', 0)
+    # A single C-level scan of the segment numbers finds the region
+    try:
+        index = regions['segment_nums'].index(segment_num)
+    except ValueError:
+        return "Not found"
 
-            if depth >= min_depth and coverage >= min_cov:
-                return "Pass"
-            else:
-                return f"Fail (Depth: {depth:.1f}, Cov: {coverage:.1f}%)"
+    depth = regions['depths'][index]
+    coverage = regions['covs'][index]
 
-    return "Not found"
+    if depth >= min_depth and coverage >= min_cov:
+        return "Pass"
+    else:
+        return f"Fail (Depth: {depth:.1f}, Cov: {coverage:.1f}%)"
 
-def sort_segment_key(region):
+def sort_segment_key(segment_num):
     """...
-    Extract the numeric segment identifier from a region for sorting purposes.
-    Handles both old and new formats.
+    Sort key for a parsed segment number; unparsed segments (None) sort last.
     """
-    segment_str = region.get('segment')
-
-    segment_num, gene_name = extract_segment_number_and_gene(segment_str)
-
     return segment_num if segment_num is not None else 999
 
-def process_influenza_files(temp_folder, influenza_type, min_depth, min_cov):
+def process_influenza_files(json_files, influenza_type, min_depth, min_cov):
     """--,
     Process Genome Detective assignment JSON files for influenza samples.
     Handles both old and new JSON formats.
     """
-    segment_table_rows = []
-    gisaid_table_rows = []
+    # Label the segment 4/6 columns with their gene names, e.g. "Segment 4 (HA)"
+    influenza_types = ['A', 'B'] if influenza_type == 'C' else [influenza_type]
+    segment4_column, segment6_column = (
+        f"Segment {segment_num} (" + '/'.join(dict.fromkeys(
+            VIRUS_CONFIG['influenza']['types'][vtype]['segments'][segment_num]
+            for vtype in influenza_types
+        )) + ")"
+        for segment_num in (4, 6)
+    )
+
+    # Tables are collected column-wise and turned into DataFrames at the end
+    segment_columns = {
+        'LimsID': [], 'VirusType': [], 'Segment': [],
+        'DepthOfCoverage': [], 'CoveragePercentage': [], 'ReferenceSequenceId': []
+    }
+    gisaid_columns = {
+        'LimsID': [], 'VirusType': [], segment4_column: [], segment6_column: [],
+        'Submit to GISAID': [], 'Subtype': [], 'Is Control': []
+    }
+    genome_info = []
     
     # Track processed samples using the unique ID
     processed_samples = set()
 
-    for json_file in Path(temp_folder).glob('*.assignments.json'):
-        influenza_data_list = parse_json_file(json_file, influenza_type, 'influenza', min_depth, min_cov)
+    for influenza_data_list, file_genome_info in parse_json_files(json_files, influenza_type, 'influenza', min_depth, min_cov):
+        genome_info.extend(file_genome_info)
         if not influenza_data_list:
             continue
 
         for influenza_data in influenza_data_list:
+            lims_id = influenza_data['LimsID']
+            vt = influenza_data['virusType']
+
             # Create unique key for this sample using the normalized ID and virus type
-            sample_key = f"{influenza_data['LimsID']}_{influenza_data['virusType']}"
+            sample_key = f"{lims_id}_{vt}"
             
             # Skip if we've already processed this sample
             if sample_key in processed_samples:
-                logging.debug(f"Skipping duplicate sample: {sample_key}")
+                logging.debug("Skipping duplicate sample: %s", sample_key)
                 continue
                 
             processed_samples.add(sample_key)
             
             # Skip if virus type is unknown
-            if influenza_data['virusType'] not in ['A', 'B']:
+            if vt not in ['A', 'B']:
                 continue
+
+            # Segment number -> gene name map for this influenza type
+            seg_map = VIRUS_CONFIG['influenza']['types'][vt]['segments']
                 
-            # Sort regions numerically
-            sorted_regions = sorted(
-                influenza_data['regions'], 
-                key=sort_segment_key
+            regions = influenza_data['regions']
+            segment_nums = regions['segment_nums']
+
+            # Sort region positions numerically by segment
+            sorted_indices = sorted(
+                range(len(segment_nums)),
+                key=lambda i: sort_segment_key(segment_nums[i])
             )
 
             # Collect segment metrics
-            for region in sorted_regions:
-                segment_num = region.get('segment_num')
+            for i in sorted_indices:
+                segment_num = segment_nums[i]
                 if segment_num is None:
                     continue
                     
-                gene_name = VIRUS_CONFIG['influenza']['types'][
-                    influenza_data['virusType']
-                ]['segments'].get(segment_num, f"Segment{segment_num}")
+                gene_name = seg_map.get(segment_num, f"Segment{segment_num}")
                 
-                segment_table_rows.append({
-                    'LimsID': influenza_data['LimsID'],
-                    'VirusType': influenza_data['virusType'],
-                    'Segment': f"Segment {segment_num} ({gene_name})",
-                    'DepthOfCoverage': region['depthOfCoverage'],
-                    'CoveragePercentage': region['coveragePercentage'],
-                    'ReferenceSequenceId': region.get('referenceSequenceId')
-                })
+                segment_columns['LimsID'].append(lims_id)
+                segment_columns['VirusType'].append(vt)
+                segment_columns['Segment'].append(f"Segment {segment_num} ({gene_name})")
+                segment_columns['DepthOfCoverage'].append(regions['depths'][i])
+                segment_columns['CoveragePercentage'].append(regions['covs'][i])
+                segment_columns['ReferenceSequenceId'].append(regions['refs'][i])
 
             # Evaluate Segment 4 (HA) and Segment 6 (NA) quality
-            segment4 = evaluate_segment(influenza_data['regions'], 4, influenza_data['virusType'], min_depth, min_cov)
-            segment6 = evaluate_segment(influenza_data['regions'], 6, influenza_data['virusType'], min_depth, min_cov)
+            segment4 = evaluate_segment(regions, 4, vt, min_depth, min_cov)
+            segment6 = evaluate_segment(regions, 6, vt, min_depth, min_cov)
             submit_to_gisaid = "Yes" if "Pass" in segment4 and "Pass" in segment6 else "No"
 
-            # Check if sample is a control
-            is_control = "Yes" if any(ctrl in influenza_data['LimsID'] for ctrl in ["PC", "NC", "Neg", "Pos", "ERCC"]) else "No"
-
             # Build GISAID submission summary
-            gisaid_table_rows.append({
-                'LimsID': influenza_data['LimsID'],
-                'VirusType': influenza_data['virusType'],
-                f"Segment 4 ({VIRUS_CONFIG['influenza']['types'][influenza_data['virusType']]['segments'][4]})": segment4,
-                f"Segment 6 ({VIRUS_CONFIG['influenza']['types'][influenza_data['virusType']]['segments'][6]})": segment6,
-                'Submit to GISAID': submit_to_gisaid,
-                'Subtype': influenza_data['subTypeConclusion'],
-                'Is Control': is_control
-            })
-
-    return pd.DataFrame(segment_table_rows), pd.DataFrame(gisaid_table_rows)
-
-def process_non_segmented_virus(temp_folder, virus_key, min_depth, min_cov):
+            gisaid_columns['LimsID'].append(lims_id)
+            gisaid_columns['VirusType'].append(vt)
+            gisaid_columns[segment4_column].append(segment4)
+            gisaid_columns[segment6_column].append(segment6)
+            gisaid_columns['Submit to GISAID'].append(submit_to_gisaid)
+            gisaid_columns['Subtype'].append(influenza_data['subTypeConclusion'])
+            gisaid_columns['Is Control'].append(influenza_data['Is Control'])
+
+    # LimsID, VirusType and Segment repeat across the rows of a run, so store them as categories
+    segment_df = pd.DataFrame(segment_columns, copy=False).astype(SEGMENT_TABLE_DTYPES)
+
+    return (segment_df,
+            pd.DataFrame(gisaid_columns, copy=False).astype(GISAID_TABLE_DTYPES),
+            extract_genome_info(genome_info))
+
+def process_non_segmented_virus(json_files, virus_key, min_depth, min_cov):
     """...
     Process Genome Detective assignment JSON files for non-segmented viruses.
     Handles both old and new JSON formats.
     """
-    gisaid_table_rows = []
+    # Table is collected column-wise and turned into a DataFrame at the end
+    gisaid_columns = {
+        'LimsID': [], 'VirusType': [], 'CoveragePercentage': [], 'DepthOfCoverage': [],
+        'Submit to GISAID': [], 'Subtype': [], 'Is Control': [], 'ReferenceSequenceId': []
+    }
+    genome_info = []
     
     # Track processed samples using the unique ID
     processed_samples = set()
 
-    for json_file in Path(temp_folder).glob('*.assignments.json'):
-        virus_data_list = parse_json_file(json_file, '', virus_key, min_depth, min_cov)
+    for virus_data_list, file_genome_info in parse_json_files(json_files, '', virus_key, min_depth, min_cov):
+        genome_info.extend(file_genome_info)
         if not virus_data_list:
             continue
 
         for virus_data in virus_data_list:
             # Skip duplicates using the normalized ID
             if virus_data['LimsID'] in processed_samples:
-                logging.debug(f"Skipping duplicate sample: {virus_data['LimsID']}")
+                logging.debug("Skipping duplicate sample: %s", virus_data['LimsID'])
                 continue
                 
             processed_samples.add(virus_data['LimsID'])
             
-            gisaid_table_rows.append({
-                'LimsID': virus_data['LimsID'],
-                'VirusType': virus_data['VirusType'],
-                'CoveragePercentage': virus_data['coveragePercentage'],
-                'DepthOfCoverage': virus_data['depthOfCoverage'],
-                'Submit to GISAID': virus_data['Submit to GISAID'],
-                'Subtype': virus_data['subTypeConclusion'],
-                'Is Control': virus_data['Is Control'],
-                'ReferenceSequenceId': virus_data['ReferenceSequenceId']
-            })
-
-    return pd.DataFrame(gisaid_table_rows)
-
-def extract_genome_info(temp_folder, virus_type, virus_key):
+            gisaid_columns['LimsID'].append(virus_data['LimsID'])
+            gisaid_columns['VirusType'].append(virus_data['VirusType'])
+            gisaid_columns['CoveragePercentage'].append(virus_data['coveragePercentage'])
+            gisaid_columns['DepthOfCoverage'].append(virus_data['depthOfCoverage'])
+            gisaid_columns['Submit to GISAID'].append(virus_data['Submit to GISAID'])
+            gisaid_columns['Subtype'].append(virus_data['subTypeConclusion'])
+            gisaid_columns['Is Control'].append(virus_data['Is Control'])
+            gisaid_columns['ReferenceSequenceId'].append(virus_data['ReferenceSequenceId'])
+
+    return pd.DataFrame(gisaid_columns, copy=False).astype(GISAID_TABLE_DTYPES), extract_genome_info(genome_info)
+
+def extract_genome_info(genome_info):
     """--,
-    Extract full-genome summary information for each strain from JSON assignment files.
-    Handles both old and new JSON formats.
+    Build the full-genome summary table from the strain rows collected by parse_json_file.
+    Keeps the first row seen for each LIMS ID and taxonomy combination.
     """
     full_genome_data = []
     
     # Track processed samples using the unique ID
     processed_samples = set()
 
-    for json_file in Path(temp_folder).glob('*.assignments.json'):
-        try:
-            with open(json_file, 'r') as f:
-                data = json.load(f)
-
-            base_name = os.path.basename(json_file).replace('.assignments.json', '')
-            lims_id = normalize_limsid(base_name)
-            
-            strains = data.get('data', {}).get('attributes', {}).get('strains', [])
+    for row in genome_info:
+        # Create unique key using LIMS ID and taxonomy
+        sample_key = f"{row['LimsID']}_{row['taxonomyName'].lower()}"
 
-            for strain in strains:
-                taxonomy = strain.get('taxonomyName', '').lower()
-                
-                # Create unique key using LIMS ID and taxonomy
-                sample_key = f"{lims_id}_{taxonomy}"
-                
-                if sample_key in processed_samples:
-                    continue
-                    
-                processed_samples.add(sample_key)
-
-                # Match correct virus for influenza
-                if virus_key == 'influenza':
-                    is_a = any(kw in taxonomy for kw in VIRUS_CONFIG['influenza']['types']['A']['taxonomy_keywords'])
-                    is_b = any(kw in taxonomy for kw in VIRUS_CONFIG['influenza']['types']['B']['taxonomy_keywords'])
-                    if (virus_type == 'A' and is_a) or \
-                       (virus_type == 'B' and is_b) or \
-                       (virus_type == 'C' and (is_a or is_b)):
-                        full_genome_data.append({
-                            'LimsID': lims_id,
-                            'VirusType': 'A' if "alpha" in taxonomy else 'B',
-                            'taxonomyName': strain.get('taxonomyName'),
-                            'numberOfReads': strain.get('numberOfReads'),
-                            'depthOfCoverage': strain.get('depthOfCoverage'),
-                            'coveragePercentage': strain.get('coveragePercentage'),
-                            'ntIdentity': strain.get('ntIdentity')
-                        })
-                else:
-                    # Match non-influenza virus based on keywords
-                    matched = False
-                    for kw in VIRUS_CONFIG[virus_key]['taxonomy_keywords']:
-                        if kw.lower() in taxonomy:
-                            matched = True
-                            break
-                    
-                    if matched:
-                        full_genome_data.append({
-                            'LimsID': lims_id,
-                            'VirusType': virus_key.upper(),
-                            'taxonomyName': strain.get('taxonomyName'),
-                            'numberOfReads': strain.get('numberOfReads'),
-                            'depthOfCoverage': strain.get('depthOfCoverage'),
-                            'coveragePercentage': strain.get('coveragePercentage'),
-                            'ntIdentity': strain.get('ntIdentity')
-                        })
+        if sample_key in processed_samples:
+            continue
 
-        except Exception as e:
-            logging.error(f"Failed to parse {json_file}: {e}")
+        processed_samples.add(sample_key)
+        full_genome_data.append(row)
 
     return pd.DataFrame(full_genome_data)
 
@@ -766,204 +1084,436 @@ def prompt_user_for_header_format(virus_type, virus_key, all_lims_ids, lab_info=
     else:
         return default_header, lab_info
 
-def get_lab_for_limsid(limsid, lab_info):
+def build_lab_index(lab_info):
+    """...
+    Invert lab_info into a {LIMS ID: lab name} lookup, built once before writing FASTA files.
+    A LIMS ID listed under several labs keeps the first lab.
+    """
+    lab_index = {}
+    for lab_name, lims_ids in lab_info.items():
+        for limsid in lims_ids:
+            lab_index.setdefault(limsid, lab_name)
+    return lab_index
+
+def get_lab_for_limsid(limsid, lab_info, lab_index):
     """--,
     Retrieve the lab name corresponding to a specific LIMS ID.
+
+    Parameters:
+        limsid (str): LIMS ID of the sample.
+        lab_info (dict): Lab name -> list of LIMS IDs.
+        lab_index (dict): LIMS ID -> lab name, from build_lab_index.
     """
     if len(lab_info) == 1:
         return next(iter(lab_info.keys()))
 
-    for lab_name, lims_ids in lab_info.items():
-        if limsid in lims_ids:
-            return lab_name
-
-    return "UNKNOWN"
+    return lab_index.get(limsid, "UNKNOWN")
 
-def get_segment_number_and_gene(header_line, virus_name, virus_type):
+def get_segment_number_and_gene(header_line, segments_map):
     """...
     Extract segment number and corresponding gene name from a segment label.
+
+    Parameters:
+        header_line (str): Segment label, e.g. "Segment 4" or "4".
+        segments_map (dict): Segment number -> gene name, from the virus type's config.
     """
     try:
-        match = re.search(r'[Ss]egment\s*(\d+)', str(header_line))
+        match = SEGMENT_NUMBER_PATTERN.search(str(header_line))
         if match:
             segment_num = int(match.group(1))
-            gene_name = VIRUS_CONFIG[virus_name]['types'][virus_type]['segments'].get(
-                segment_num, f"Segment{segment_num}"
-            )
+            gene_name = segments_map.get(segment_num, f"Segment{segment_num}")
             return segment_num, gene_name
 
         elif str(header_line).strip().isdigit():
             segment_num = int(header_line.strip())
-            gene_name = VIRUS_CONFIG[virus_name]['types'][virus_type]['segments'].get(
-                segment_num, f"Segment{segment_num}"
-            )
+            gene_name = segments_map.get(segment_num, f"Segment{segment_num}")
             return segment_num, gene_name
 
     except Exception as e:
-        logging.warning(f"Error parsing segment from header '{header_line}': {e}")
+        logging.warning("Error parsing segment from header '%s': %s", header_line, e)
 
     return None, None
 
-def find_sample_folder(input_folder, limsid):
+def ensure_dir(path, created):
+    """...
+    Create a folder (and its parents) if needed, skipping folders already
+    created by the same writer call.
+
+    Parameters:
+        path (str): Folder to create.
+        created (set): Folders created so far by the calling writer; updated in place.
+    """
+    if path not in created:
+        os.makedirs(path, exist_ok=True)
+        created.add(path)
+
+def list_sample_folders(input_folder):
+    """--,
+    List the sample folders in a folder, in directory order.
+    Done once per run so that sample lookups don't re-list the folder.
+
+    Returns:
+        list: (folder name, folder path) tuples.
+    """
+    with os.scandir(input_folder) as entries:
+        return [(entry.name, entry.path) for entry in entries if entry.is_dir()]
+
+def index_sample_folders(sample_folders):
+    """...
+    Join the sample folder names into one NUL-separated string, so a LIMS ID is
+    searched for in every folder name with a single str.find.
+
+    Parameters:
+        sample_folders (list): (folder name, folder path) tuples from list_sample_folders.
+
+    Returns:
+        dict: 'names' (joined folder names), 'starts' (offset of each name), 'paths' (folder paths).
+    """
+    starts = []
+    offset = 0
+    for folder, _ in sample_folders:
+        starts.append(offset)
+        offset += len(folder) + 1
+
+    return {
+        'names': '\0'.join(folder for folder, _ in sample_folders),
+        'starts': starts,
+        'paths': [folder_path for _, folder_path in sample_folders],
+    }
+
+def find_sample_folder(folder_index, limsid):
     """--,
     Find the sample folder that contains the given LIMS ID.
     Uses the unique C0/K0 ID to match folders that may have prefixes/suffixes.
+
+    Parameters:
+        folder_index (dict): Sample folder index from index_sample_folders.
+        limsid (str): LIMS ID of the sample.
     """
     unique_id = extract_unique_id(limsid)
-    
-    for folder in os.listdir(input_folder):
-        folder_path = os.path.join(input_folder, folder)
-        if not os.path.isdir(folder_path):
-            continue
-            
-        # Check if the unique ID is in the folder name
-        if unique_id in folder:
-            return folder_path
-        
-        # Also check if the full LIMS ID is in the folder name
-        if limsid in folder:
-            return folder_path
-    
-    return None
 
-def find_alignment_file(sample_folder, ref_id):
+    # The unique ID is part of the full LIMS ID, so any folder containing the LIMS ID
+    # also contains the unique ID; its first occurrence lies in the first such folder
+    position = folder_index['names'].find(unique_id)
+    if position < 0 or not folder_index['paths']:
+        return None
+
+    return folder_index['paths'][bisect.bisect_right(folder_index['starts'], position) - 1]
+
+def list_alignment_files(sample_folder):
     """...
-    Find alignment file in sample folder that matches the reference ID.
-    Handles various filename patterns.
+    List the alignment files (`*alignment-nt.fasta`) in a sample folder, in directory order.
+
+    Returns:
+        list: (file name, file path) tuples.
     """
     if not sample_folder or not os.path.exists(sample_folder):
+        return []
+
+    with os.scandir(sample_folder) as entries:
+        return [
+            (entry.name, entry.path) for entry in entries
+            if entry.name.endswith('alignment-nt.fasta') and entry.is_file()
+        ]
+
+def find_alignment_file(alignment_files, ref_id):
+    """...
+    Find the alignment file that matches the reference ID.
+    Handles various filename patterns.
+
+    Parameters:
+        alignment_files (list): (file name, file path) tuples from list_alignment_files.
+        ref_id (str): Reference sequence ID, e.g. "NC_007366.1".
+    """
+    if not isinstance(ref_id, str):
         return None
-        
-    for file in os.listdir(sample_folder):
-        file_path = os.path.join(sample_folder, file)
-        if not os.path.isfile(file_path):
-            continue
-            
-        # Check if reference ID is in the filename and it's an alignment file
-        if ref_id in file and file.endswith('alignment-nt.fasta'):
-            return file_path
-        
-        # Also try with just the accession number (without version)
-        accession = ref_id.split('.')[0] if '.' in ref_id else ref_id
-        if accession in file and file.endswith('alignment-nt.fasta'):
+
+    # Also try with just the accession number (without version)
+    accession = ref_id.split('.')[0] if '.' in ref_id else ref_id
+
+    for file, file_path in alignment_files:
+        # Check if reference ID is in the filename
+        if ref_id in file or accession in file:
             return file_path
     
     return None
 
-def write_segment_fastas(input_folder, segment_df, gisaid_df, virus_type):
+def read_consensus(alignment_file):
+    """--,
+    Read an alignment file in one go, returning the header lines and the consensus
+    (everything after the second header, with the whitespace removed).
+
+    Returns:
+        tuple: (list of header lines, consensus sequence)
+    """
+    with open(alignment_file, 'rb') as f:
+        data = f.read()
+
+    # Accept Windows (\r\n) and old Mac (\r) line endings, as text mode did
+    if b'\r' in data:
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+    matches = list(FASTA_HEADER_PATTERN.finditer(data))
+    headers = [match.group(1).decode() for match in matches]
+    if len(matches) < 2:
+        return headers, ''
+
+    return headers, b''.join(data[matches[1].end():].split()).decode()
+
+def compile_header_template(header_template, placeholders):
+    """...
+    Split a header template once into its literal text and placeholders,
+    so each header is then built with a single join.
+
+    Parameters:
+        header_template (str): e.g. ">A/South Africa/<lab>-CERI-<LimsID>/2026_<gene>".
+        placeholders (tuple): Placeholder names to fill in, e.g. ('LimsID', 'lab').
+
+    Returns:
+        function: Takes the placeholder values as keyword arguments and returns the header.
+    """
+    pattern = re.compile('<(' + '|'.join(map(re.escape, placeholders)) + ')>')
+
+    literals = []
+    fields = []
+    last = 0
+    for match in pattern.finditer(header_template):
+        literals.append(header_template[last:match.start()])
+        fields.append(match.group(1))
+        last = match.end()
+    literals.append(header_template[last:])
+
+    def render(**values):
+        pieces = [literals[0]]
+        for field, literal in zip(fields, literals[1:]):
+            pieces.append(values[field])
+            pieces.append(literal)
+        return ''.join(pieces)
+
+    return render
+
+def run_in_order(jobs):
+    """...
+    Run a list of callables one after another (one thread's share of the FASTA writing).
+    """
+    for job in jobs:
+        job()
+
+def write_sample_segments(segments, segments_map, alignment_files, sample_input_folder,
+                          dst_folder, limsid, unique_id, sample_virus_type, lab_name, render_header,
+                          header_cleanup):
+    """--,
+    Write the segment FASTA files of one influenza sample from its alignment files.
+    """
+    for seg_row in segments.itertuples(index=False):
+        ref_id = seg_row.ReferenceSequenceId
+        depth_id = seg_row.DepthOfCoverage
+        coverage_id = seg_row.CoveragePercentage
+        seg_name = seg_row.Segment
+        seg_num, gene_name = get_segment_number_and_gene(seg_name, segments_map)
+
+        if not seg_num:
+            logging.warning("Could not extract segment number from %s for sample %s", seg_name, limsid)
+            continue
+
+        if depth_id >= 10 and coverage_id >= 80:
+            alignment_file = find_alignment_file(alignment_files, ref_id)
+            
+            if alignment_file:
+                try:
+                    headers, full_sequence = read_consensus(alignment_file)
+                    if len(headers) != 2:
+                        logging.warning("Expected exactly 2 sequences in %s, found %s. Skipping.", alignment_file, len(headers))
+                        continue
+
+                    new_header = render_header(LimsID=unique_id, gene=gene_name,
+                                               lab=lab_name, isolate=sample_virus_type)
+
+                    if not new_header.startswith('>'):
+                        new_header = '>' + new_header
+
+                    new_header = header_cleanup.sub(f'>{sample_virus_type}/', new_header)
+
+                    dst_file = os.path.join(dst_folder, f'segment{seg_num}.fasta')
+                    
+                    # Check if file already exists
+                    if os.path.exists(dst_file):
+                        logging.debug("File already exists, skipping: %s", dst_file)
+                        continue
+                        
+                    with open(dst_file, 'w') as out:
+                        out.write(f"{new_header}\n{full_sequence}\n")
+
+                    logging.info("Written segment fasta: %s", dst_file)
+
+                except Exception as e:
+                    logging.error("Failed to process %s: %s", alignment_file, e)
+            else:
+                logging.debug("No alignment file found for reference ID %s in %s", ref_id, sample_input_folder)
+
+def write_segment_fastas(input_folder, segment_df, eligible, virus_type):
     """--,
     Write individual FASTA files for each segment of influenza virus samples that passed GISAID thresholds.
+
+    Parameters:
+        eligible (DataFrame): Rows of the submission table with 'Submit to GISAID' == 'Yes'.
+
+    Returns:
+        list: (unique ID, output folder) of each sample folder created under Outputs.
     """
-    eligible = gisaid_df[gisaid_df['Submit to GISAID'] == 'Yes']
     if eligible.empty:
         logging.info("No eligible samples for FASTA generation")
-        return
+        return []
         
     all_lims_ids = eligible['LimsID'].tolist()
 
     temp2_folder = os.path.join(os.getcwd(), 'Outputs')
-    os.makedirs(temp2_folder, exist_ok=True)
+    created_folders = set()
+    ensure_dir(temp2_folder, created_folders)
 
     header_template, lab_info = prompt_user_for_header_format(virus_type, 'influenza', all_lims_ids)
+    lab_index = build_lab_index(lab_info)
+    render_header = compile_header_template(header_template, ('LimsID', 'gene', 'lab', 'isolate'))
+
+    # ">A/A/" and ">AB/" become ">A/" (likewise for B), in a single pass per header
+    header_cleanups = {
+        v_type: re.compile(re.escape(f'>{v_type}/{v_type}/') + '|>AB/')
+        for v_type in VIRUS_CONFIG['influenza']['types']
+    }
+
+    # List the input folder once, and each sample folder the first time it is used
+    folder_index = index_sample_folders(list_sample_folders(input_folder))
+    files_by_folder = {}
+
+    # Row positions of each sample's segments, grouped once instead of filtering per sample
+    if segment_df.empty:
+        segment_positions = {}
+    else:
+        segment_positions = segment_df.groupby(['LimsID', 'VirusType'], observed=True, sort=False).indices
     
     # Track processed samples to avoid duplicates
     processed_samples = set()
 
-    for _, row in eligible.iterrows():
-        limsid = row['LimsID']
+    # Samples sharing an output folder are written in order by the same thread
+    jobs_by_folder = {}
+
+    # Sample folders under Outputs, handed to the concatenation steps
+    manifest = {}
+
+    for row in eligible[['LimsID', 'VirusType']].itertuples(index=False):
+        limsid = row.LimsID
+        sample_virus_type = row.VirusType
         unique_id = extract_unique_id(limsid)
         
         # Skip duplicates
-        sample_key = f"{limsid}_{row['VirusType']}"
+        sample_key = f"{limsid}_{sample_virus_type}"
         if sample_key in processed_samples:
-            logging.debug(f"Skipping duplicate sample: {sample_key}")
+            logging.debug("Skipping duplicate sample: %s", sample_key)
             continue
             
         processed_samples.add(sample_key)
 
         # Determine output folder - use the unique ID for folder name
         if virus_type == 'C':
-            dst_folder = os.path.join(temp2_folder, unique_id, f'Influenza_{row["VirusType"]}')
+            dst_folder = os.path.join(temp2_folder, unique_id, f'Influenza_{sample_virus_type}')
         else:
             dst_folder = os.path.join(temp2_folder, unique_id)
-        os.makedirs(dst_folder, exist_ok=True)
+        ensure_dir(dst_folder, created_folders)
+        manifest.setdefault(unique_id, os.path.join(temp2_folder, unique_id))
 
         # Find sample input folder
-        sample_input_folder = find_sample_folder(input_folder, limsid)
+        sample_input_folder = find_sample_folder(folder_index, limsid)
 
         if not sample_input_folder:
-            logging.warning(f"No folder containing {limsid} (unique ID: {unique_id}) found in {input_folder}")
+            logging.warning("No folder containing %s (unique ID: %s) found in %s", limsid, unique_id, input_folder)
             continue
 
+        if sample_input_folder not in files_by_folder:
+            files_by_folder[sample_input_folder] = list_alignment_files(sample_input_folder)
+        alignment_files = files_by_folder[sample_input_folder]
+
         # Get segments for this sample
-        segments = segment_df[(segment_df['LimsID'] == limsid) & 
-                              (segment_df['VirusType'] == row['VirusType'])]
-
-        for _, seg_row in segments.iterrows():
-            ref_id = seg_row['ReferenceSequenceId']
-            depth_id = seg_row['DepthOfCoverage']
-            coverage_id = seg_row['CoveragePercentage']
-            seg_name = seg_row['Segment']
-            seg_num, gene_name = get_segment_number_and_gene(seg_name, 'influenza', row['VirusType'])
-
-            if not seg_num:
-                logging.warning(f"Could not extract segment number from {seg_name} for sample {limsid}")
-                continue
+        segments_map = VIRUS_CONFIG['influenza']['types'][sample_virus_type]['segments']
+        positions = segment_positions.get((limsid, sample_virus_type), [])
+        segments = segment_df.iloc[positions]
 
-            if depth_id >= 10 and coverage_id >= 80:
-                alignment_file = find_alignment_file(sample_input_folder, ref_id)
-                
-                if alignment_file:
-                    try:
-                        with open(alignment_file, 'r') as f:
-                            lines = [line.strip() for line in f if line.strip()]
+        jobs_by_folder.setdefault(dst_folder, []).append(partial(
+            write_sample_segments, segments, segments_map, alignment_files, sample_input_folder,
+            dst_folder, limsid, unique_id, sample_virus_type,
+            get_lab_for_limsid(limsid, lab_info, lab_index), render_header,
+            header_cleanups[sample_virus_type]
+        ))
+
+    with ThreadPoolExecutor(max_workers=FASTA_WRITER_WORKERS) as executor:
+        list(executor.map(run_in_order, jobs_by_folder.values()))
 
-                        headers = [i for i, line in enumerate(lines) if line.startswith('>')]
-                        if len(headers) != 2:
-                            logging.warning(f"Expected exactly 2 sequences in {alignment_file}, found {len(headers)}. Skipping.")
-                            continue
+    return list(manifest.items())
 
-                        consensus_start = headers[1]
-                        full_sequence = ''.join(lines[consensus_start + 1:])
+def write_sample_fasta(sample_input_folder, sample_folder, unique_id, ref_id,
+                       virus_key, lab_name, render_header):
+    """...
+    Write the FASTA file of one non-segmented virus sample from its alignment file.
+    """
+    alignment_file = find_alignment_file(list_alignment_files(sample_input_folder), ref_id)
+    
+    if alignment_file:
+        try:
+            headers, sequence = read_consensus(alignment_file)
+            if len(headers) < 2:
+                logging.warning("Expected 2 headers in %s, found %s. Skipping.", alignment_file, len(headers))
+                return
+
+            subtype = "Unknown"  # Default value
+            if virus_key == "rsv" and headers:
+                first_header = headers[0]  # Get the first header line
+                
+                # Look for Subgroup_B pattern
+                subgroup_match = re.search(r'Subgroup', first_header)
+                if subgroup_match:
+                    subtype = 'B'
+                    logging.info("Extracted subtype %s for sample %s from header: %s...", subtype, unique_id, first_header[:100])
+                else:
+                    subtype = 'A'
+                    logging.warning(" Sample %s, is assigned RSV-A, as their is no Subgroup B", unique_id)
 
-                        lab_name = get_lab_for_limsid(limsid, lab_info)
+            
+            # Build the header with appropriate replacements
+            if virus_key == "rsv":
+                new_header = render_header(LimsID=unique_id, lab=lab_name, subtype=subtype)
+            else:
+                new_header = render_header(LimsID=unique_id, lab=lab_name)
 
-                        new_header = header_template \
-                            .replace('<LimsID>', unique_id) \
-                            .replace('<gene>', gene_name) \
-                            .replace('<lab>', lab_name) \
-                            .replace('<isolate>', f'{row["VirusType"]}')
+            dst_file = os.path.join(sample_folder, f"{unique_id}_{virus_key}.fasta")
 
-                        if not new_header.startswith('>'):
-                            new_header = '>' + new_header
+            # Check if file already exists
+            if os.path.exists(dst_file):
+                logging.debug("File already exists, skipping: %s", dst_file)
+                return
+                
+            with open(dst_file, 'w') as out:
+                out.write(f"{new_header}\n{sequence}\n")
 
-                        new_header = new_header.replace(f'>{row["VirusType"]}/{row["VirusType"]}/', f'>{row["VirusType"]}/')
-                        new_header = new_header.replace('>AB/', f'>{row["VirusType"]}/')
+            logging.info("Written FASTA file: %s", dst_file)
 
-                        dst_file = os.path.join(dst_folder, f'segment{seg_num}.fasta')
-                        
-                        # Check if file already exists
-                        if os.path.exists(dst_file):
-                            logging.debug(f"File already exists, skipping: {dst_file}")
-                            continue
-                            
-                        with open(dst_file, 'w') as out:
-                            out.write(f"{new_header}\n{full_sequence}\n")
-
-                        logging.info(f"Written segment fasta: {dst_file}")
-
-                    except Exception as e:
-                        logging.error(f"Failed to process {alignment_file}: {e}")
-                else:
-                    logging.debug(f"No alignment file found for reference ID {ref_id} in {sample_input_folder}")
+        except Exception as e:
+            logging.error("Failed to process %s: %s", alignment_file, e)
+    else:
+        logging.debug("No alignment file found for reference ID %s in %s", ref_id, sample_input_folder)
 
-def write_virus_fastas(input_folder, df, virus_key, lab_info):
+def write_virus_fastas(input_folder, eligible_samples, virus_key, lab_info):
     """...
     Write FASTA files for non-segmented virus samples that passed GISAID criteria.
     For RSV, extracts subtype from the original alignment file header.
+
+    Parameters:
+        eligible_samples (DataFrame): Rows of the submission table with 'Submit to GISAID' == 'Yes'.
+
+    Returns:
+        list: (unique ID, output folder) of each sample folder created under Outputs.
     """
     temp_folder = os.path.join(os.getcwd(), 'Outputs')
-    os.makedirs(temp_folder, exist_ok=True)
+    created_folders = set()
+    ensure_dir(temp_folder, created_folders)
 
     if virus_key == "rsv":
         print(f"\nRSV subtype detection:")
@@ -987,108 +1537,114 @@ def write_virus_fastas(input_folder, df, virus_key, lab_info):
     else:
         header_template = default_header
 
-    eligible_samples = df[df['Submit to GISAID'] == 'Yes']
+    if virus_key == "rsv":
+        render_header = compile_header_template(header_template, ('LimsID', 'lab', 'subtype'))
+    else:
+        render_header = compile_header_template(header_template, ('LimsID', 'lab'))
+
     if eligible_samples.empty:
         logging.info("No eligible samples for FASTA generation")
-        return
+        return []
     
+    # List the input folder once for all sample lookups
+    folder_index = index_sample_folders(list_sample_folders(input_folder))
+    lab_index = build_lab_index(lab_info)
+
     # Track processed samples
     processed_samples = set()
 
-    for _, row in eligible_samples.iterrows():
-        limsid = row['LimsID']
+    # Samples sharing an output folder are written in order by the same thread
+    jobs_by_folder = {}
+
+    # Sample folders under Outputs, handed to the concatenation step
+    manifest = {}
+
+    for row in eligible_samples[['LimsID', 'ReferenceSequenceId']].itertuples(index=False):
+        limsid = row.LimsID
         unique_id = extract_unique_id(limsid)
         
         # Skip duplicates
         if limsid in processed_samples:
-            logging.debug(f"Skipping duplicate sample: {limsid}")
+            logging.debug("Skipping duplicate sample: %s", limsid)
             continue
             
         processed_samples.add(limsid)
         
-        ref_id = row['ReferenceSequenceId']
+        ref_id = row.ReferenceSequenceId
 
         sample_folder = os.path.join(temp_folder, unique_id)
-        os.makedirs(sample_folder, exist_ok=True)
+        ensure_dir(sample_folder, created_folders)
+        manifest.setdefault(unique_id, sample_folder)
 
         # Find sample input folder
-        sample_input_folder = find_sample_folder(input_folder, limsid)
+        sample_input_folder = find_sample_folder(folder_index, limsid)
 
         if not sample_input_folder:
-            logging.warning(f"No folder containing {limsid} (unique ID: {unique_id}) found in {input_folder}")
+            logging.warning("No folder containing %s (unique ID: %s) found in %s", limsid, unique_id, input_folder)
             continue
 
-        alignment_file = find_alignment_file(sample_input_folder, ref_id)
-        
-        if alignment_file:
-            try:
-                with open(alignment_file, 'r') as f:
-                    lines = [line.strip() for line in f if line.strip()]
-
-                headers = [i for i, line in enumerate(lines) if line.startswith('>')]
-                if len(headers) < 2:
-                    logging.warning(f"Expected 2 headers in {alignment_file}, found {len(headers)}. Skipping.")
-                    continue
-
-                sequence = ''.join(lines[headers[1] + 1:])
+        jobs_by_folder.setdefault(sample_folder, []).append(partial(
+            write_sample_fasta, sample_input_folder, sample_folder, unique_id, ref_id,
+            virus_key, get_lab_for_limsid(limsid, lab_info, lab_index), render_header
+        ))
 
-                lab_name = get_lab_for_limsid(limsid, lab_info)
-                subtype = "Unknown"  # Default value
-                if virus_key == "rsv" and headers:
-                    first_header = lines[headers[0]]  # Get the first header line
-                    
-                    # Look for Subgroup_B pattern
-                    subgroup_match = re.search(r'Subgroup', first_header)
-                    if subgroup_match:
-                        subtype = 'B'
-                        logging.info(f"Extracted subtype {subtype} for sample {unique_id} from header: {first_header[:100]}...")
-                    else:
-                        subtype = 'A'
-                        logging.warning(f" Sample {unique_id}, is assigned RSV-A, as their is no Subgroup B")
-
-                
-                # Build the header with appropriate replacements
-                if virus_key == "rsv":
-                    new_header = header_template\
-                        .replace('<LimsID>', unique_id)\
-                        .replace('<lab>', lab_name)\
-                        .replace('<subtype>', subtype)
-                else:
-                    new_header = header_template\
-                        .replace('<LimsID>', unique_id)\
-                        .replace('<lab>', lab_name)
+    with ThreadPoolExecutor(max_workers=FASTA_WRITER_WORKERS) as executor:
+        list(executor.map(run_in_order, jobs_by_folder.values()))
 
-                dst_file = os.path.join(sample_folder, f"{unique_id}_{virus_key}.fasta")
+    return list(manifest.items())
 
-                # Check if file already exists
-                if os.path.exists(dst_file):
-                    logging.debug(f"File already exists, skipping: {dst_file}")
-                    continue
-                    
-                with open(dst_file, 'w') as out:
-                    out.write(f"{new_header}\n{sequence}\n")
+def list_segment_fastas(folder):
+    """...
+    List the `segment*.fasta` files in a folder, sorted by path.
+    """
+    with os.scandir(folder) as entries:
+        return sorted(
+            entry.path for entry in entries
+            if entry.name.startswith('segment') and entry.name.endswith('.fasta')
+        )
 
-                logging.info(f"Written FASTA file: {dst_file}")
+def append_fasta(outfile, fasta_file):
+    """--,
+    Append a FASTA file to an output file opened in binary mode, followed by one newline.
+    Leading and trailing whitespace is dropped; files already in that form (as written
+    by this script) are copied by the kernel with os.sendfile, or in chunks where that
+    is not available, without being decoded.
+    """
+    with open(fasta_file, 'rb') as infile:
+        size = os.fstat(infile.fileno()).st_size
+        if size >= 2:
+            first = infile.read(1)
+            infile.seek(-2, os.SEEK_END)
+            last = infile.read(2)
+            if not first.isspace() and last[1:] == b'\n' and not last[:1].isspace():
+                outfile.flush()
+                offset = 0
+                try:
+                    while offset < size:
+                        sent = os.sendfile(outfile.fileno(), infile.fileno(), offset, size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                except (AttributeError, OSError):
+                    # No sendfile for this platform or output; copy the rest in chunks
+                    infile.seek(offset)
+                    shutil.copyfileobj(infile, outfile, READ_BUFFER_SIZE)
+                return
 
-            except Exception as e:
-                logging.error(f"Failed to process {alignment_file}: {e}")
-        else:
-            logging.debug(f"No alignment file found for reference ID {ref_id} in {sample_input_folder}")
+        infile.seek(0)
+        outfile.write(infile.read().strip() + b'\n')
 
-def concatenate_segments_per_sample(virus_type):
+def concatenate_segments_per_sample(manifest, virus_type):
     """--,
     Concatenate individual influenza segment FASTA files per sample into one multi-segment file.
+
+    Parameters:
+        manifest (list): (unique ID, output folder) pairs returned by write_segment_fastas.
     """
-    temp2_folder = os.path.join(os.getcwd(), 'Outputs')
-    
     # Track processed samples
     processed_samples = set()
 
-    for folder_name in os.listdir(temp2_folder):
-        sample_folder = os.path.join(temp2_folder, folder_name)
-        if not os.path.isdir(sample_folder):
-            continue
-        
+    for folder_name, sample_folder in manifest:
         # The folder name should be the unique ID
         unique_id = folder_name
 
@@ -1105,25 +1661,19 @@ def concatenate_segments_per_sample(virus_type):
                     
                 processed_samples.add(sample_key)
 
-                segment_files = sorted([
-                    os.path.join(type_folder, f)
-                    for f in os.listdir(type_folder)
-                    if f.startswith('segment') and f.endswith('.fasta')
-                ])
+                segment_files = list_segment_fastas(type_folder)
 
                 if segment_files:
                     concatenated_fasta = os.path.join(type_folder, f"{unique_id}_all_segments.fasta")
                     
                     # Skip if already exists
                     if os.path.exists(concatenated_fasta):
-                        logging.debug(f"Concatenated file already exists: {concatenated_fasta}")
+                        logging.debug("Concatenated file already exists: %s", concatenated_fasta)
                         continue
                         
-                    with open(concatenated_fasta, 'w') as outfile:
+                    with open(concatenated_fasta, 'wb') as outfile:
                         for seg_file in segment_files:
-                            with open(seg_file, 'r') as infile:
-                                content = infile.read().strip()
-                                outfile.write(content + '\n')
+                            append_fasta(outfile, seg_file)
                     #logging.info(f"Concatenated segments for sample {unique_id} (type {influ_type}) into {concatenated_fasta}")
 
         else:
@@ -1133,33 +1683,38 @@ def concatenate_segments_per_sample(virus_type):
                 
             processed_samples.add(unique_id)
             
-            segment_files = sorted([
-                os.path.join(sample_folder, f)
-                for f in os.listdir(sample_folder)
-                if f.startswith('segment') and f.endswith('.fasta')
-            ])
+            segment_files = list_segment_fastas(sample_folder)
 
             if segment_files:
                 concatenated_fasta = os.path.join(sample_folder, f"{unique_id}_all_segments.fasta")
                 
                 # Skip if already exists
                 if os.path.exists(concatenated_fasta):
-                    logging.debug(f"Concatenated file already exists: {concatenated_fasta}")
+                    logging.debug("Concatenated file already exists: %s", concatenated_fasta)
                     continue
                     
-                with open(concatenated_fasta, 'w') as outfile:
+                with open(concatenated_fasta, 'wb') as outfile:
                     for seg_file in segment_files:
-                        with open(seg_file, 'r') as infile:
-                            content = infile.read().strip()
-                            outfile.write(content + '\n')
-                logging.info(f"Concatenated segments for sample {unique_id} into {concatenated_fasta}")
+                        append_fasta(outfile, seg_file)
+                logging.info("Concatenated segments for sample %s into %s", unique_id, concatenated_fasta)
 
-def concatenate_all_samples_fasta(virus_type, virus_key, output_filename_prefix="all_samples_combined"):
+def concatenate_all_samples_fasta(manifest, virus_type, virus_key, output_filename_prefix="all_samples_combined"):
     """...
     Concatenate all per-sample full-genome FASTA files into a single master file.
+
+    Parameters:
+        manifest (list): (unique ID, output folder) pairs returned by the FASTA writer.
     """
     temp2_folder = os.path.join(os.getcwd(), 'Outputs')
 
+    # Controls are excluded once, not once per influenza type
+    sample_folders = []
+    for folder_name, sample_folder in manifest:
+        if is_control_sample(folder_name):
+            logging.info("Skipping control sample: %s", folder_name)
+            continue
+        sample_folders.append((folder_name, sample_folder))
+
     if virus_type == 'AB':
         for influ_type in ['A', 'B']:
             combined_fasta_path = os.path.join(temp2_folder, f"{output_filename_prefix}_{influ_type}.fasta")
@@ -1169,29 +1724,19 @@ def concatenate_all_samples_fasta(virus_type, virus_key, output_filename_prefix=
                 logging.info(f"Combined file already exists: {combined_fasta_path}")
                 continue
                 
-            with open(combined_fasta_path, 'w') as outfile:
-                for folder_name in os.listdir(temp2_folder):
-                    sample_folder = os.path.join(temp2_folder, folder_name)
-                    if not os.path.isdir(sample_folder):
-                        continue
-
-                    if any(ctrl in folder_name for ctrl in ["PC", "NC", "Neg", "Pos", "ERCC"]):
-                        logging.info(f"Skipping control sample: {folder_name}")
-                        continue
-
+            with open(combined_fasta_path, 'wb') as outfile:
+                for folder_name, sample_folder in sample_folders:
                     type_folder = os.path.join(sample_folder, f'Influenza_{influ_type}')
                     if not os.path.exists(type_folder):
                         continue
 
                     all_segments_fasta = os.path.join(type_folder, f"{folder_name}_all_segments.fasta")
                     if not os.path.exists(all_segments_fasta):
-                        logging.debug(f"Missing concatenated fasta for sample {folder_name}: {all_segments_fasta}")
+                        logging.debug("Missing concatenated fasta for sample %s: %s", folder_name, all_segments_fasta)
                         continue
 
-                    with open(all_segments_fasta, 'r') as infile:
-                        content = infile.read().strip()
-                        outfile.write(f">{folder_name}\n")
-                        outfile.write(content + '\n')
+                    outfile.write(f">{folder_name}\n".encode())
+                    append_fasta(outfile, all_segments_fasta)
 
             logging.info(f"Combined fasta for all {influ_type} samples written to {combined_fasta_path}")
 
@@ -1203,16 +1748,8 @@ def concatenate_all_samples_fasta(virus_type, virus_key, output_filename_prefix=
             logging.info(f"Combined file already exists: {combined_fasta_path}")
             return
             
-        with open(combined_fasta_path, 'w') as outfile:
-            for folder_name in os.listdir(temp2_folder):
-                sample_folder = os.path.join(temp2_folder, folder_name)
-                if not os.path.isdir(sample_folder):
-                    continue
-
-                if any(ctrl in folder_name for ctrl in ["PC", "NC", "Neg", "Pos", "ERCC"]):
-                    logging.info(f"Skipping control sample: {folder_name}")
-                    continue
-
+        with open(combined_fasta_path, 'wb') as outfile:
+            for folder_name, sample_folder in sample_folders:
                 # Look for the concatenated FASTA file
                 if virus_key == 'influenza':
                     fasta_file = os.path.join(sample_folder, f"{folder_name}_all_segments.fasta")
@@ -1221,15 +1758,24 @@ def concatenate_all_samples_fasta(virus_type, virus_key, output_filename_prefix=
                     fasta_file = os.path.join(sample_folder, f"{folder_name}_{virus_key}.fasta")
                     
                 if not os.path.exists(fasta_file):
-                    logging.debug(f"Missing fasta file for sample {folder_name}: {fasta_file}")
+                    logging.debug("Missing fasta file for sample %s: %s", folder_name, fasta_file)
                     continue
 
-                with open(fasta_file, 'r') as infile:
-                    content = infile.read().strip()
-                    outfile.write(content + '\n')
+                append_fasta(outfile, fasta_file)
 
         logging.info(f"Combined fasta for all samples written to {combined_fasta_path}")
 
+def split_by_virus_type(df):
+    """--,
+    Split a summary table into one table per virus type, keeping the row order.
+
+    Returns:
+        dict: Virus type -> rows of that type (types without rows are left out).
+    """
+    if df.empty:
+        return {}
+    return {v_type: group for v_type, group in df.groupby('VirusType', observed=True, sort=False)}
+
 def main(input_folder):
     """--,
     Main entry point for the viral analysis pipeline.
@@ -1245,17 +1791,15 @@ def main(input_folder):
     )
     min_depth, min_cov = get_coverage_thresholds()
 
-    print("Copying assignment files to temporary folder...")
-    temp_folder = create_temp_folder(input_folder)
+    print("Collecting assignment files...")
+    json_files = collect_assignment_files(input_folder)
 
     if virus_key == 'influenza':
-        segment_df, gisaid_df = process_influenza_files(temp_folder, virus_type, min_depth, min_cov)
+        segment_df, gisaid_df, full_genome_df = process_influenza_files(json_files, virus_type, min_depth, min_cov)
     else:
-        gisaid_df = process_non_segmented_virus(temp_folder, virus_key, min_depth, min_cov)
+        gisaid_df, full_genome_df = process_non_segmented_virus(json_files, virus_key, min_depth, min_cov)
         segment_df = None
 
-    full_genome_df = extract_genome_info(temp_folder, virus_type, virus_key)
-
     # Validation checks
     if virus_key == 'influenza':
         if virus_type in ['A', 'B'] and (gisaid_df.empty or len(gisaid_df) == 0):
@@ -1276,13 +1820,31 @@ def main(input_folder):
     output_dir = os.path.join(os.getcwd(), 'Summary_files')
     os.makedirs(output_dir, exist_ok=True)
 
+    # Sort each table by LIMS ID once; the per-type tables below keep this order.
+    # A stable sort keeps samples with the same LIMS ID in the order they were read.
+    if segment_df is not None and not segment_df.empty:
+        segment_df = segment_df.sort_values(by='LimsID', kind='stable')
+    if not gisaid_df.empty:
+        gisaid_df = gisaid_df.sort_values(by='LimsID', kind='stable')
+    if not full_genome_df.empty:
+        full_genome_df = full_genome_df.sort_values(by='LimsID', kind='stable')
+
+    # Samples passing the GISAID thresholds, filtered once for the counts and FASTA writers
+    eligible_df = gisaid_df[gisaid_df['Submit to GISAID'] == 'Yes']
+
     # Generate summary CSVs
     if virus_key == 'influenza':
         if virus_type == 'C':
+            # Split each table by virus type once, rather than masking it for each type
+            segment_by_type = split_by_virus_type(segment_df)
+            gisaid_by_type = split_by_virus_type(gisaid_df)
+            genome_by_type = split_by_virus_type(full_genome_df)
+            eligible_by_type = split_by_virus_type(eligible_df)
+
             for v_type in ['A', 'B']:
-                type_segment_df = segment_df[segment_df['VirusType'] == v_type].sort_values(by='LimsID') if not segment_df.empty else pd.DataFrame()
-                type_gisaid_df = gisaid_df[gisaid_df['VirusType'] == v_type].sort_values(by='LimsID') if not gisaid_df.empty else pd.DataFrame()
-                type_genome_df = full_genome_df[full_genome_df['VirusType'] == v_type].sort_values(by='LimsID') if not full_genome_df.empty else pd.DataFrame()
+                type_segment_df = segment_by_type.get(v_type, pd.DataFrame())
+                type_gisaid_df = gisaid_by_type.get(v_type, pd.DataFrame())
+                type_genome_df = genome_by_type.get(v_type, pd.DataFrame())
 
                 if not type_segment_df.empty:
                     type_segment_df.to_csv(os.path.join(output_dir, f'influenza_{v_type.lower()}_segments.csv'), index=False)
@@ -1292,61 +1854,54 @@ def main(input_folder):
                     type_genome_df.to_csv(os.path.join(output_dir, f'full_genome_info_{v_type.lower()}.csv'), index=False)
 
                 if not type_gisaid_df.empty:
-                    eligible_count = len(type_gisaid_df[type_gisaid_df['Submit to GISAID'] == 'Yes'])
-                    control_count = len(type_gisaid_df[(type_gisaid_df['Submit to GISAID'] == 'Yes') &
-                                                       (type_gisaid_df['Is Control'] == 'Yes')])
+                    type_eligible_df = eligible_by_type.get(v_type, eligible_df.iloc[:0])
+                    eligible_count = len(type_eligible_df)
+                    control_count = int((type_eligible_df['Is Control'] == 'Yes').sum())
                     logging.info(f"Influenza {v_type} - Total samples: {len(type_gisaid_df)}, "
                                  f"GISAID-eligible: {eligible_count} (including {control_count} controls)")
         else:
             if not segment_df.empty:
-                segment_df = segment_df.sort_values(by='LimsID')
                 segment_df.to_csv(os.path.join(output_dir, f'influenza_{virus_type.lower()}_segments.csv'), index=False)
             
             if not gisaid_df.empty:
-                gisaid_df = gisaid_df.sort_values(by='LimsID')
                 gisaid_df.to_csv(os.path.join(output_dir, f'gisaid_submission_status_{virus_type.lower()}.csv'), index=False)
             
             if not full_genome_df.empty:
-                full_genome_df = full_genome_df.sort_values(by='LimsID')
                 full_genome_df.to_csv(os.path.join(output_dir, f'full_genome_info_{virus_type.lower()}.csv'), index=False)
 
             if not gisaid_df.empty:
-                eligible_count = len(gisaid_df[gisaid_df['Submit to GISAID'] == 'Yes'])
-                control_count = len(gisaid_df[(gisaid_df['Submit to GISAID'] == 'Yes') &
-                                              (gisaid_df['Is Control'] == 'Yes')])
+                eligible_count = len(eligible_df)
+                control_count = int((eligible_df['Is Control'] == 'Yes').sum())
                 logging.info(f"Total samples: {len(gisaid_df)}, GISAID-eligible: {eligible_count} (including {control_count} controls)")
     else:
         if not gisaid_df.empty:
-            gisaid_df = gisaid_df.sort_values(by='LimsID')
             gisaid_df.to_csv(os.path.join(output_dir, f'gisaid_submission_status_{virus_key}.csv'), index=False)
         
         if not full_genome_df.empty:
-            full_genome_df = full_genome_df.sort_values(by='LimsID')
             full_genome_df.to_csv(os.path.join(output_dir, f'full_genome_info_{virus_key}.csv'), index=False)
 
         if not gisaid_df.empty:
-            eligible_count = len(gisaid_df[gisaid_df['Submit to GISAID'] == 'Yes'])
-            control_count = len(gisaid_df[(gisaid_df['Submit to GISAID'] == 'Yes') &
-                                          (gisaid_df['Is Control'] == 'Yes')])
+            eligible_count = len(eligible_df)
+            control_count = int((eligible_df['Is Control'] == 'Yes').sum())
             logging.info(f"Total samples: {len(gisaid_df)}, GISAID-eligible: {eligible_count} (including {control_count} controls)")
 
     # Write FASTA files
     if virus_key == 'influenza' and not gisaid_df.empty:
         logging.info("Writing segment FASTA files...")
-        write_segment_fastas(input_folder, segment_df, gisaid_df, virus_type)
+        manifest = write_segment_fastas(input_folder, segment_df, eligible_df, virus_type)
         logging.info("Concatenating segments per sample...")
-        concatenate_segments_per_sample(virus_type_header)
+        concatenate_segments_per_sample(manifest, virus_type_header)
         logging.info("Creating combined FASTA file...")
-        concatenate_all_samples_fasta(virus_type_header, 'influenza')
+        concatenate_all_samples_fasta(manifest, virus_type_header, 'influenza')
     elif not gisaid_df.empty:
         logging.info("Preparing lab information...")
         all_lims_ids = gisaid_df['LimsID'].tolist()
         multiple_labs = prompt_for_multiple_labs()
         lab_info = get_lab_info(multiple_labs, all_lims_ids)
         logging.info("Writing virus FASTA files...")
-        write_virus_fastas(input_folder, gisaid_df, virus_key, lab_info)
+        manifest = write_virus_fastas(input_folder, eligible_df, virus_key, lab_info)
         logging.info("Creating combined FASTA file...")
-        concatenate_all_samples_fasta(virus_type_header, virus_key)
+        concatenate_all_samples_fasta(manifest, virus_type_header, virus_key)
 
     logging.info("Pipeline completed successfully!")
     return True